@@ -1,5 +1,13 @@
+import concurrent.futures
+import threading
+import unicodedata
+from collections import OrderedDict
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -13,7 +21,7 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
+_CSS = """
     <style>
     .main-header {
         font-size: 2.5rem;
@@ -36,7 +44,8 @@ st.markdown("""
         margin: 0.5rem 0;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # Weather code descriptions
 WEATHER_CODES = {
@@ -66,46 +75,165 @@ WEATHER_CODES = {
     99: "⛈️ Thunderstorm with heavy hail"
 }
 
-@st.cache_data(ttl=1800)
-def get_weather_data(latitude, longitude):
-    """Fetch weather data from Open-Meteo API"""
+# Forecast request parameters; latitude/longitude are filled in per call
+_FORECAST_PARAMS_TEMPLATE = {
+    "current": "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m,wind_direction_10m",
+    "hourly": "temperature_2m,relative_humidity_2m,precipitation_probability,precipitation,weather_code,wind_speed_10m",
+    "daily": "weather_code,temperature_2m_max,temperature_2m_min,precipitation_sum,wind_speed_10m_max",
+    "timezone": "auto"
+}
+
+# (connect, read) timeouts in seconds for Open-Meteo requests
+_TIMEOUT = (3.0, 7.0)
+
+# Max forecasts kept for ETag revalidation
+_ETAG_STORE_MAX = 64
+
+# Sidebar shortcuts
+_POPULAR_CITIES = {
+    "Seoul 🇰🇷": (37.5665, 126.9780),
+    "Tokyo 🇯🇵": (35.6762, 139.6503),
+    "New York 🇺🇸": (40.7128, -74.0060),
+    "London 🇬🇧": (51.5074, -0.1278),
+    "Paris 🇫🇷": (48.8566, 2.3522),
+    "Sydney 🇦🇺": (-33.8688, 151.2093)
+}
+
+# Card wrapper for the current-weather columns, rendered with one markdown call each
+_CARD_TMPL = "<div class='weather-card'>{body}</div>"
+
+@st.cache_resource
+def _code_lut():
+    """Lookup table indexed by WMO weather code (all codes are below 100)"""
+    lut = np.full(100, "Unknown", dtype=object)
+    for code, desc in WEATHER_CODES.items():
+        lut[code] = desc
+    return lut
+
+def _describe_codes(codes):
+    """Map weather codes to descriptions, treating nulls and unknown codes as Unknown"""
+    lut = _code_lut()
+    codes = np.asarray(codes, dtype=float)
+    valid = np.isfinite(codes) & (codes >= 0) & (codes < len(lut))
+    descs = lut[np.where(valid, codes, 0).astype(np.intp)]
+    descs[~valid] = "Unknown"
+    return descs
+
+@st.cache_resource(show_spinner=False)
+def _session():
+    """Shared HTTP session so repeated calls reuse keep-alive connections"""
+    s = requests.Session()
+    s.headers["Accept-Encoding"] = "gzip"
+    # Retry connect errors and transient 5xx quickly; read timeouts are not
+    # retried so a slow upstream fails fast, and 429 is surfaced immediately
+    # rather than hammering a rate-limited API
+    retry = Retry(
+        total=2,
+        connect=2,
+        read=0,
+        backoff_factor=0.1,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"})
+    )
+    for base_url in ("https://api.open-meteo.com", "https://geocoding-api.open-meteo.com"):
+        s.mount(base_url, HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    return s
+
+@st.cache_resource(show_spinner=False)
+def _executor():
+    """Background workers for speculative forecast fetches that warm the cache"""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource(show_spinner=False)
+def _etag_store():
+    """Lock and LRU of last ETag and decoded forecast per (latitude, longitude)"""
+    return threading.Lock(), OrderedDict()
+
+def _etag_get(key):
+    """Return the stored (etag, data) for key, marking it recently used"""
+    lock, store = _etag_store()
+    with lock:
+        entry = store.get(key)
+        if entry is not None:
+            store.move_to_end(key)
+        return entry
+
+def _etag_put(key, etag, data):
+    """Store (etag, data) for key, evicting the least recently used entries"""
+    lock, store = _etag_store()
+    with lock:
+        store[key] = (etag, data)
+        store.move_to_end(key)
+        while len(store) > _ETAG_STORE_MAX:
+            store.popitem(last=False)
+
+def _fetch_weather(latitude, longitude):
+    """Fetch weather data from Open-Meteo API, raising on failure"""
     url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weather_code,wind_speed_10m,wind_direction_10m",
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation_probability,precipitation,weather_code,wind_speed_10m",
-        "daily": "weather_code,temperature_2m_max,temperature_2m_min,precipitation_sum,wind_speed_10m_max",
-        "timezone": "auto"
-    }
+    params = dict(_FORECAST_PARAMS_TEMPLATE, latitude=latitude, longitude=longitude)
+    
+    # Revalidate with the last ETag so unchanged forecasts are not re-downloaded
+    cached = _etag_get((latitude, longitude))
+    headers = {"If-None-Match": cached[0]} if cached else None
     
+    response = _session().get(url, params=params, headers=headers, timeout=_TIMEOUT)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    etag = response.headers.get("ETag")
+    if etag:
+        _etag_put((latitude, longitude), etag, data)
+    return data
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def _cached_weather(latitude, longitude):
+    """Cached forecast; exceptions propagate so failures are never cached"""
+    return _fetch_weather(latitude, longitude)
+
+def get_weather_data(latitude, longitude):
+    """Fetch weather data from Open-Meteo API"""
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return _cached_weather(latitude, longitude)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         st.error(f"Error fetching weather data: {e}")
         return None
 
+def _prefetch_weather(latitude, longitude):
+    """Warm the forecast cache from a worker thread without touching the page"""
+    try:
+        _cached_weather(latitude, longitude)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError):
+        pass
+
+def _normalize_query(city_name):
+    """Normalize a city query so near-identical inputs share a cache entry"""
+    return city_name.strip().lower()
+
+def _query_too_short(query):
+    """Skip early keystrokes; CJK names such as 서울 are only two characters"""
+    is_cjk = any(unicodedata.east_asian_width(ch) in "WF" for ch in query)
+    return len(query) < (2 if is_cjk else 3)
+
 @st.cache_data(ttl=3600)
-def geocode_location(city_name):
-    """Geocode city name to coordinates using Open-Meteo Geocoding API"""
+def geocode_location(query):
+    """Geocode a normalized city query using Open-Meteo Geocoding API"""
     url = "https://geocoding-api.open-meteo.com/v1/search"
     params = {
-        "name": city_name,
+        "name": query,
         "count": 5,
         "language": "en",
         "format": "json"
     }
     
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = _session().get(url, params=params, timeout=_TIMEOUT)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         if data.get('results'):
             return data['results']
         return None
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         st.error(f"Error geocoding location: {e}")
         return None
 
@@ -115,51 +243,50 @@ def display_current_weather(weather_data):
     
     col1, col2, col3, col4 = st.columns(4)
     
+    weather_code = current.get('weather_code', 0)
+    weather_desc = WEATHER_CODES.get(weather_code, "Unknown")
+    
     with col1:
-        st.markdown("<div class='weather-card'>", unsafe_allow_html=True)
-        weather_code = current.get('weather_code', 0)
-        weather_desc = WEATHER_CODES.get(weather_code, "Unknown")
-        st.markdown(f"<div style='font-size: 2rem;'>{weather_desc}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='big-temp'>{current['temperature_2m']}°C</div>", unsafe_allow_html=True)
-        st.markdown(f"Feels like: {current['apparent_temperature']}°C")
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown(_CARD_TMPL.format(body=(
+            f"<div style='font-size: 2rem;'>{weather_desc}</div>"
+            f"<div class='big-temp'>{current['temperature_2m']}°C</div>"
+            f"<p>Feels like: {current['apparent_temperature']}°C</p>"
+        )), unsafe_allow_html=True)
     
     with col2:
-        st.markdown("<div class='weather-card'>", unsafe_allow_html=True)
-        st.markdown("### 💧 Humidity")
-        st.markdown(f"<div class='weather-metric'>{current['relative_humidity_2m']}%</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown(_CARD_TMPL.format(body=(
+            "<h3>💧 Humidity</h3>"
+            f"<div class='weather-metric'>{current['relative_humidity_2m']}%</div>"
+        )), unsafe_allow_html=True)
     
     with col3:
-        st.markdown("<div class='weather-card'>", unsafe_allow_html=True)
-        st.markdown("### 💨 Wind Speed")
-        st.markdown(f"<div class='weather-metric'>{current['wind_speed_10m']} km/h</div>", unsafe_allow_html=True)
-        st.markdown(f"Direction: {current['wind_direction_10m']}°")
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown(_CARD_TMPL.format(body=(
+            "<h3>💨 Wind Speed</h3>"
+            f"<div class='weather-metric'>{current['wind_speed_10m']} km/h</div>"
+            f"<p>Direction: {current['wind_direction_10m']}°</p>"
+        )), unsafe_allow_html=True)
     
     with col4:
-        st.markdown("<div class='weather-card'>", unsafe_allow_html=True)
-        st.markdown("### 🌧️ Precipitation")
-        st.markdown(f"<div class='weather-metric'>{current['precipitation']} mm</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown(_CARD_TMPL.format(body=(
+            "<h3>🌧️ Precipitation</h3>"
+            f"<div class='weather-metric'>{current['precipitation']} mm</div>"
+        )), unsafe_allow_html=True)
 
 def display_hourly_forecast(weather_data):
     """Display hourly forecast chart"""
     hourly = weather_data['hourly']
     
-    # Create DataFrame for next 24 hours
-    df = pd.DataFrame({
-        'time': pd.to_datetime(hourly['time'][:24]),
-        'temperature': hourly['temperature_2m'][:24],
-        'precipitation': hourly['precipitation'][:24],
-        'humidity': hourly['relative_humidity_2m'][:24]
-    })
+    # Next 24 hours as float32 arrays, passed to Plotly directly
+    times = pd.to_datetime(hourly['time'][:24])
+    temp = np.asarray(hourly['temperature_2m'][:24], dtype=np.float32)
+    precip = np.asarray(hourly['precipitation'][:24], dtype=np.float32)
+    humidity = np.asarray(hourly['relative_humidity_2m'][:24], dtype=np.float32)
     
     # Temperature chart
     fig_temp = go.Figure()
-    fig_temp.add_trace(go.Scatter(
-        x=df['time'],
-        y=df['temperature'],
+    fig_temp.add_trace(go.Scattergl(
+        x=times,
+        y=temp,
         mode='lines+markers',
         name='Temperature',
         line=dict(color='#FF6B6B', width=3),
@@ -177,14 +304,14 @@ def display_hourly_forecast(weather_data):
     # Precipitation and Humidity chart
     fig_precip = go.Figure()
     fig_precip.add_trace(go.Bar(
-        x=df['time'],
-        y=df['precipitation'],
+        x=times,
+        y=precip,
         name='Precipitation',
         marker_color='#4ECDC4'
     ))
-    fig_precip.add_trace(go.Scatter(
-        x=df['time'],
-        y=df['humidity'],
+    fig_precip.add_trace(go.Scattergl(
+        x=times,
+        y=humidity,
         name='Humidity',
         yaxis='y2',
         line=dict(color='#95E1D3', width=2)
@@ -202,37 +329,40 @@ def display_hourly_forecast(weather_data):
 def display_daily_forecast(weather_data):
     """Display 7-day forecast"""
     daily = weather_data['daily']
+    dates = pd.to_datetime(daily['time'])
     
     st.markdown("### 📅 7-Day Forecast")
     
+    date_strs = dates.strftime('%Y-%m-%d (%a)')
+    # Table keeps float64 so one-decimal values display exactly
+    temp_max = np.asarray(daily['temperature_2m_max'], dtype=np.float64)
+    temp_min = np.asarray(daily['temperature_2m_min'], dtype=np.float64)
+    
     df_daily = pd.DataFrame({
-        'Date': pd.to_datetime(daily['time']),
-        'Max Temp (°C)': daily['temperature_2m_max'],
-        'Min Temp (°C)': daily['temperature_2m_min'],
-        'Precipitation (mm)': daily['precipitation_sum'],
-        'Max Wind (km/h)': daily['wind_speed_10m_max'],
-        'Weather': [WEATHER_CODES.get(code, "Unknown") for code in daily['weather_code']]
+        'Date': date_strs,
+        'Max Temp (°C)': temp_max,
+        'Min Temp (°C)': temp_min,
+        'Precipitation (mm)': np.asarray(daily['precipitation_sum'], dtype=np.float64),
+        'Max Wind (km/h)': np.asarray(daily['wind_speed_10m_max'], dtype=np.float64),
+        'Weather': _describe_codes(daily['weather_code'])
     })
     
-    df_daily['Date'] = df_daily['Date'].dt.strftime('%Y-%m-%d (%a)')
-    
     st.dataframe(df_daily, use_container_width=True, hide_index=True)
     
     # Temperature range chart
     fig_daily = go.Figure()
-    dates = pd.to_datetime(daily['time'])
     
-    fig_daily.add_trace(go.Scatter(
+    fig_daily.add_trace(go.Scattergl(
         x=dates,
-        y=daily['temperature_2m_max'],
+        y=temp_max.astype(np.float32),
         mode='lines+markers',
         name='Max Temp',
         line=dict(color='#FF6B6B', width=2),
         marker=dict(size=8)
     ))
-    fig_daily.add_trace(go.Scatter(
+    fig_daily.add_trace(go.Scattergl(
         x=dates,
-        y=daily['temperature_2m_min'],
+        y=temp_min.astype(np.float32),
         mode='lines+markers',
         name='Min Temp',
         line=dict(color='#4ECDC4', width=2),
@@ -247,6 +377,10 @@ def display_daily_forecast(weather_data):
     )
     st.plotly_chart(fig_daily, use_container_width=True)
 
+def display_location_map(latitude, longitude):
+    """Display selected location on a map"""
+    st.map({'lat': [latitude], 'lon': [longitude]}, zoom=8)
+
 def main():
     # Header
     st.markdown("<div class='main-header'>⛅ Open-Meteo Interactive Weather Dashboard</div>", 
@@ -261,9 +395,19 @@ def main():
         st.subheader("Search by City")
         city_name = st.text_input("Enter city name", placeholder="e.g., Seoul, Tokyo, New York")
         
-        if city_name:
-            locations = geocode_location(city_name)
+        query = _normalize_query(city_name)
+        if query and _query_too_short(query):
+            st.caption("Type at least 3 letters (2 for Korean, Japanese or Chinese names) to search.")
+        elif query:
+            locations = geocode_location(query)
             if locations:
+                # Prefetch forecasts for the top candidates once per query
+                # so selecting one is instant
+                prefetched = st.session_state.setdefault('_prefetched_queries', set())
+                if query not in prefetched:
+                    prefetched.add(query)
+                    for loc in locations[:3]:
+                        _executor().submit(_prefetch_weather, loc['latitude'], loc['longitude'])
                 location_options = [
                     f"{loc['name']}, {loc.get('admin1', '')}, {loc['country']}"
                     for loc in locations
@@ -291,16 +435,13 @@ def main():
         
         st.markdown("---")
         st.markdown("### 📍 Popular Cities")
-        popular_cities = {
-            "Seoul 🇰🇷": (37.5665, 126.9780),
-            "Tokyo 🇯🇵": (35.6762, 139.6503),
-            "New York 🇺🇸": (40.7128, -74.0060),
-            "London 🇬🇧": (51.5074, -0.1278),
-            "Paris 🇫🇷": (48.8566, 2.3522),
-            "Sydney 🇦🇺": (-33.8688, 151.2093)
-        }
+        # Warm the forecast cache for popular cities once per session
+        if not st.session_state.get('_popular_cities_warmed'):
+            for lat, lon in _POPULAR_CITIES.values():
+                _executor().submit(_prefetch_weather, lat, lon)
+            st.session_state._popular_cities_warmed = True
         
-        for city, (lat, lon) in popular_cities.items():
+        for city, (lat, lon) in _POPULAR_CITIES.items():
             if st.button(city, use_container_width=True):
                 st.session_state.latitude = lat
                 st.session_state.longitude = lon
@@ -338,11 +479,7 @@ def main():
         # Map
         st.markdown("---")
         st.markdown("## 🗺️ Location Map")
-        map_df = pd.DataFrame({
-            'lat': [st.session_state.latitude],
-            'lon': [st.session_state.longitude]
-        })
-        st.map(map_df, zoom=8)
+        display_location_map(st.session_state.latitude, st.session_state.longitude)
         
     else:
         st.error("Unable to fetch weather data. Please try again.")